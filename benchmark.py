@@ -0,0 +1,74 @@
+import os
+import sys
+import json
+import subprocess
+
+
+PIPELINE_MODULES = [
+    'chunk_table',
+    'evaluation_utils',
+    'fixed_token_chunker',
+    'pipeline_utils',
+    'evaluation',
+    'dataset_analysis',
+    'parallel_utils',
+    'retrieval_evaluation_pipeline',
+    'hyperparameter_tuning',
+    'visualization_utils',
+]
+
+HEAVY_MODULES = ['torch', 'sentence_transformers', 'matplotlib']
+
+_IMPORT_PROBE = """
+import sys, time, json
+start = time.perf_counter()
+import {module}
+elapsed = time.perf_counter() - start
+print(json.dumps({{'seconds': elapsed, 'loaded': [name for name in {heavy} if name in sys.modules]}}))
+"""
+
+
+def measure_import_time(module):
+    """
+    Measures the time needed to import a module in a fresh Python interpreter.
+
+    Parameters:
+    ----------
+    module (str): Name of the module to be imported (e.g. 'pipeline_utils').
+
+    Returns:
+    ----------
+    dict: A dictionary with the following keys:
+        - 'module': The name of the module.
+        - 'seconds': The import time in seconds (cold, in a new process).
+        - 'loaded': The heavy dependencies (see 'HEAVY_MODULES') that were loaded as a side effect of the import.
+    """
+
+    probe = _IMPORT_PROBE.format(module=module, heavy=HEAVY_MODULES)
+    output = subprocess.run([sys.executable, '-c', probe], cwd=os.path.dirname(os.path.abspath(__file__)),
+                            capture_output=True, text=True, check=True).stdout
+
+    return {'module': module, **json.loads(output.strip().splitlines()[-1])}
+
+
+def benchmark_imports(modules=PIPELINE_MODULES):
+    """
+    Measures and prints the cold import time of each of the pipeline modules.
+
+    Returns:
+    ----------
+    list of dicts: The results of 'measure_import_time' for each module.
+    """
+
+    results = [measure_import_time(module) for module in modules]
+
+    print('Import cost:')
+    for result in results:
+        loaded = ', '.join(result['loaded']) if result['loaded'] else '-'
+        print('\t{:<32} {:8.3f} s   heavy deps: {}'.format(result['module'], result['seconds'], loaded))
+
+    return results
+
+
+if __name__ == '__main__':
+    benchmark_imports()
@@ -0,0 +1,116 @@
+import numpy as np
+
+
+class ChunkTable:
+    """
+    Compact, array-backed table of chunk metadata.
+
+    Each chunk is described by four int64 columns stored in parallel arrays:
+    - 'start': The index where the chunk starts in the original corpus.
+    - 'end': The index where the chunk ends in the original corpus.
+    - 'token_count': The number of tokens in the chunk (-1 if unknown).
+    - 'corpus_id': The index of the corpus the chunk belongs to.
+
+    The chunk text is not stored; it is decoded lazily from the corpora (if given) by slicing.
+    For compatibility with code written against the list-of-dicts metadata, indexing the table
+    with a chunk ID returns a dictionary with 'start_index' and 'end_index' keys.
+    """
+
+    N_COLUMNS = 4
+
+    def __init__(self, start, end, token_count=None, corpus_id=None, corpora=None):
+        """
+        Parameters:
+        ----------
+        start (array-like of int): Start index of each chunk.
+        end (array-like of int): End index of each chunk.
+        token_count (array-like of int, optional): Token count of each chunk. Default is None (all -1).
+        corpus_id (array-like of int, optional): Corpus index of each chunk. Default is None (all 0).
+        corpora (str or list of str, optional): The corpus text (or a list of texts indexed by 'corpus_id'),
+                                                used to decode chunk texts on demand. Default is None.
+        """
+
+        self.start = np.asarray(start, dtype=np.int64)
+        self.end = np.asarray(end, dtype=np.int64)
+        N = len(self.start)
+
+        self.token_count = np.full(N, -1, dtype=np.int64) if token_count is None else np.asarray(token_count, dtype=np.int64)
+        self.corpus_id = np.zeros(N, dtype=np.int64) if corpus_id is None else np.asarray(corpus_id, dtype=np.int64)
+
+        self.corpora = [corpora] if isinstance(corpora, str) else corpora
+
+    def __len__(self):
+        return len(self.start)
+
+    def __getitem__(self, id):
+        return {"start_index": int(self.start[id]), "end_index": int(self.end[id])}
+
+    def __iter__(self):
+        for id in range(len(self)):
+            yield self[id]
+
+    def text(self, id):
+        """Decodes the text of the chunk with the given ID from the corpora."""
+
+        if self.corpora is None:
+            raise ValueError("Chunk texts are not available: the table was created without 'corpora'.")
+
+        return self.corpora[self.corpus_id[id]][self.start[id]:self.end[id]]
+
+    def to_dicts(self):
+        """Returns the metadata as a list of dictionaries with 'start_index' and 'end_index' keys."""
+        return list(self)
+
+    def to_array(self):
+        """Returns the table as a single (N, 4) int64 array with columns: start, end, token_count, corpus_id."""
+        return np.stack([self.start, self.end, self.token_count, self.corpus_id], axis=1)
+
+    @classmethod
+    def from_array(cls, array, corpora=None):
+        """Creates a table from an (N, 4) array (see 'to_array'). The columns are views, no data is copied."""
+        return cls(array[:, 0], array[:, 1], array[:, 2], array[:, 3], corpora=corpora)
+
+    @classmethod
+    def from_dicts(cls, chunk_metadata, corpora=None):
+        """Creates a table from a list of dictionaries with 'start_index' and 'end_index' keys."""
+
+        start = np.fromiter((metadata["start_index"] for metadata in chunk_metadata), dtype=np.int64, count=len(chunk_metadata))
+        end = np.fromiter((metadata["end_index"] for metadata in chunk_metadata), dtype=np.int64, count=len(chunk_metadata))
+
+        return cls(start, end, corpora=corpora)
+
+    def save(self, path):
+        """Saves the table to a '.npy' file, which can be loaded (optionally memory-mapped) with 'ChunkTable.load'."""
+        np.save(path, self.to_array())
+
+    @classmethod
+    def load(cls, path, mmap_mode='r', corpora=None):
+        """Loads a table saved with 'ChunkTable.save'. By default, the file is memory-mapped read-only."""
+        return cls.from_array(np.load(path, mmap_mode=mmap_mode), corpora=corpora)
+
+
+def chunk_spans(chunk_metadata, ids):
+    """
+    Gathers the start and end indices of the chunks with the given IDs.
+
+    Parameters:
+    ----------
+    chunk_metadata (ChunkTable or list of dicts): The chunk metadata.
+    ids (numpy.ndarray): An array of chunk IDs (of any shape).
+
+    Returns:
+    ----------
+    tuple: A tuple containing:
+        - starts (numpy.ndarray): The start indices, with the same shape as 'ids'.
+        - ends (numpy.ndarray): The end indices, with the same shape as 'ids'.
+    """
+
+    ids = np.asarray(ids)
+
+    if isinstance(chunk_metadata, ChunkTable):
+        return chunk_metadata.start[ids], chunk_metadata.end[ids]
+
+    starts = np.array([chunk_metadata[id]["start_index"] for id in ids.ravel()], dtype=np.int64).reshape(ids.shape)
+    ends = np.array([chunk_metadata[id]["end_index"] for id in ids.ravel()], dtype=np.int64).reshape(ids.shape)
+
+    return starts, ends
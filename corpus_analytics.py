@@ -0,0 +1,176 @@
+import os
+import json
+import math
+import hashlib
+import pandas as pd
+from pipeline_utils import read_dataset
+from evaluation_utils import union_ranges, sum_of_ranges
+
+
+class TokenCounter:
+    """
+    Counts tokens of texts with a tiktoken encoding, in batches and with a cache keyed by the text hash.
+
+    Texts are encoded with 'encode_ordinary_batch' (multi-threaded), and only texts whose hash is not yet in the
+    cache are encoded. The cache can optionally be persisted to a JSON file, so that token counts are reused
+    across runs (e.g. when the same corpora are analyzed before every sweep).
+    """
+
+    def __init__(self, encoding_name='cl100k_base', cache_path=None, num_threads=8):
+        """
+        Parameters:
+        ----------
+        encoding_name (str, optional): Name of the tiktoken encoding. Default is 'cl100k_base'.
+        cache_path (str, optional): Path of the JSON file in which token counts are persisted. Default is None (in-memory only).
+        num_threads (int, optional): Number of threads used by tiktoken for batch encoding. Default is 8.
+        """
+
+        self.encoding_name = encoding_name
+        self.cache_path = cache_path
+        self.num_threads = num_threads
+        self._encoding = None
+
+        self.cache = {}
+        if cache_path is not None and os.path.exists(cache_path):
+            with open(cache_path, "r", encoding="utf-8") as file:
+                self.cache = json.load(file)
+
+    @property
+    def encoding(self):
+        if self._encoding is None:
+            import tiktoken
+            self._encoding = tiktoken.get_encoding(self.encoding_name)
+        return self._encoding
+
+    def _key(self, text):
+        return hashlib.sha1((self.encoding_name + '\0' + text).encode('utf-8')).hexdigest()
+
+    def count(self, texts):
+        """
+        Returns the number of tokens of each of the given texts.
+
+        Parameters:
+        ----------
+        texts (list of str): The texts to be tokenized.
+
+        Returns:
+        ----------
+        token_counts (list of int): The number of tokens of each text, in the same order as 'texts'.
+        """
+
+        keys = [self._key(text) for text in texts]
+
+        missing = {}
+        for key, text in zip(keys, texts):
+            if key not in self.cache and key not in missing:
+                missing[key] = text
+
+        if missing:
+            encoded = self.encoding.encode_ordinary_batch(list(missing.values()), num_threads=self.num_threads)
+            for key, tokens in zip(missing.keys(), encoded):
+                self.cache[key] = len(tokens)
+
+        return [self.cache[key] for key in keys]
+
+    def save(self):
+        """Persists the cache to 'cache_path' (if set)."""
+
+        if self.cache_path is None:
+            return
+
+        directory = os.path.dirname(self.cache_path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+
+        with open(self.cache_path, "w", encoding="utf-8") as file:
+            json.dump(self.cache, file)
+
+
+def expected_chunk_count(N_tokens, chunk_size, chunk_overlap):
+    """
+    Returns the number of chunks that 'FixedTokenChunker' produces for a text of 'N_tokens' tokens.
+    """
+
+    if N_tokens <= chunk_size:
+        return 1 if N_tokens > 0 else 0
+
+    return 1 + math.ceil((N_tokens - chunk_size)/(chunk_size - chunk_overlap))
+
+
+def analyze_corpora(corpus_ids, chunk_size_values=(), overlap_percentages=(0,), token_counter=None):
+    """
+    Computes corpus-level statistics for several corpora in one pass, to size chunking grids before a sweep.
+
+    The questions file is read once, and all corpora and highlighted excerpts are tokenized in a single batch
+    (see 'TokenCounter'), so repeated analyses only encode texts that have not been seen before.
+
+    Parameters:
+    ----------
+    corpus_ids (list of str): Identifiers of the corpora to be loaded using 'read_dataset'.
+    chunk_size_values (list of int, optional): Chunk sizes (in tokens) for which the expected number of chunks is computed.
+    overlap_percentages (list of int, optional): Chunk overlaps (in percent of the chunk size) for which the expected
+                                                 number of chunks is computed. Default is (0,).
+    token_counter (TokenCounter, optional): The token counter to be used. Default is None (a new in-memory counter).
+
+    Returns:
+    ----------
+    tuple: A tuple containing:
+        - corpus_stats (pandas.DataFrame): One row per corpus with the columns:
+            - 'corpus_id', 'N_characters', 'N_tokens', 'N_queries', 'N_highlights'
+            - 'highlight_tokens_mean', 'highlight_tokens_max': Token statistics of the highlighted excerpts.
+            - 'highlight_coverage': The fraction of the corpus characters covered by at least one highlight.
+            - 'chunks_cs{chunk_size}_co{chunk_overlap}': The expected number of chunks for each chunking configuration.
+        - tokens_per_highlight (dict): For each corpus ID, the list of token counts of its highlighted excerpts.
+    """
+
+    if token_counter is None:
+        token_counter = TokenCounter()
+
+    questions_df = pd.read_csv(os.path.join('dataset','questions_df.csv'))
+
+    corpora = {}
+    highlights = {}
+    for corpus_id in corpus_ids:
+        corpus, queries, relevant_excerpts = read_dataset(corpus_id, questions_df)
+        corpora[corpus_id] = corpus
+        highlights[corpus_id] = [highlight for excerpts in relevant_excerpts for highlight in excerpts]
+
+    # Single batch over all corpora and highlights
+    texts = list(corpora.values()) + [highlight['content'] for corpus_id in corpus_ids for highlight in highlights[corpus_id]]
+    token_counts = token_counter.count(texts)
+    token_counter.save()
+
+    corpus_tokens = dict(zip(corpus_ids, token_counts[:len(corpus_ids)]))
+
+    tokens_per_highlight = {}
+    offset = len(corpus_ids)
+    for corpus_id in corpus_ids:
+        tokens_per_highlight[corpus_id] = token_counts[offset:offset + len(highlights[corpus_id])]
+        offset += len(highlights[corpus_id])
+
+    rows = []
+    for corpus_id in corpus_ids:
+
+        N_characters = len(corpora[corpus_id])
+        highlight_tokens = tokens_per_highlight[corpus_id]
+        highlight_ranges = [(int(highlight['start_index']), int(highlight['end_index'])) for highlight in highlights[corpus_id]]
+
+        row = {
+            'corpus_id': corpus_id,
+            'N_characters': N_characters,
+            'N_tokens': corpus_tokens[corpus_id],
+            'N_queries': int((questions_df.iloc[:,-1] == corpus_id).sum()),
+            'N_highlights': len(highlight_tokens),
+            'highlight_tokens_mean': sum(highlight_tokens)/len(highlight_tokens) if highlight_tokens else 0,
+            'highlight_tokens_max': max(highlight_tokens, default=0),
+            'highlight_coverage': sum_of_ranges(union_ranges(highlight_ranges))/N_characters if highlight_ranges and N_characters else 0,
+        }
+
+        for chunk_size in chunk_size_values:
+            for overlap_percentage in overlap_percentages:
+                chunk_overlap = int(overlap_percentage*chunk_size/100)
+                row[f'chunks_cs{chunk_size}_co{chunk_overlap}'] = expected_chunk_count(corpus_tokens[corpus_id], chunk_size, chunk_overlap)
+
+        rows.append(row)
+
+    return pd.DataFrame(rows), tokens_per_highlight
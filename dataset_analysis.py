@@ -1,8 +1,8 @@
 from pipeline_utils import read_dataset
-import tiktoken
+from corpus_analytics import TokenCounter
 
 
-def analyze_relevant_excerpts(corpus_id):
+def analyze_relevant_excerpts(corpus_id, token_counter=None):
     """
     Analyzes the relevant excerpts associated with a given corpus and given queries by computing:
     1. The number of highlighted excerpts for each query.
@@ -11,6 +11,8 @@ def analyze_relevant_excerpts(corpus_id):
     Parameters:
     ----------
     corpus_id (str): Identifier of the corpus to be loaded using 'read_dataset'.
+    token_counter (TokenCounter, optional): Batched, cached token counter to be used (see 'corpus_analytics').
+                                            Default is None (a new 'cl100k_base' counter).
 
     Returns:
     ----------
@@ -21,25 +23,12 @@ def analyze_relevant_excerpts(corpus_id):
 
     corpus, queries, relevant_excerpts = read_dataset(corpus_id)
 
-    encoding = tiktoken.get_encoding('cl100k_base')
+    if token_counter is None:
+        token_counter = TokenCounter('cl100k_base')
 
-    N_queries = len(queries)
-    highlights_per_query = []
-    tokens_per_highlight = []
+    highlights_per_query = [len(highlights) for highlights in relevant_excerpts]
 
-    for query_index in range(N_queries):
-
-        highlights = relevant_excerpts[query_index]
-        highlights_per_query.append(len(highlights))
-
-        tokens_per_highlight_per_query = []
-        for highlight in highlights:
-            highlight_tokens = encoding.encode(highlight['content'])
-            
-            N_tokens = len(highlight_tokens)
-            tokens_per_highlight_per_query.append(N_tokens)
-        
-        tokens_per_highlight.extend(tokens_per_highlight_per_query)
+    # All highlights are tokenized in a single batch
+    tokens_per_highlight = token_counter.count([highlight['content'] for highlights in relevant_excerpts for highlight in highlights])
 
     return highlights_per_query, tokens_per_highlight
-
@@ -0,0 +1,168 @@
+import os
+import hashlib
+import numpy as np
+from dataclasses import dataclass
+
+
+# Encoded query matrices are persisted next to the dataset
+QUERY_CACHE_DIR = os.path.join('dataset', 'query_embeddings')
+
+
+@dataclass(frozen=True)
+class EmbeddingConfig:
+    """
+    Embedding configuration distinguishing query and document encoding, for asymmetric models that expect
+    a prefix or an instruction in front of the text (e.g. 'query: ' and 'passage: ' for E5 models).
+    """
+
+    model_id: str
+    """Identifier of the embedding model, used to key the cache of encoded queries"""
+    query_prefix: str = ''
+    """Prefix (or instruction) prepended to every query"""
+    document_prefix: str = ''
+    """Prefix (or instruction) prepended to every chunk"""
+
+    def query_function(self, embedding_function):
+        """Returns a function that embeds a query with 'embedding_function' after prepending the query prefix."""
+        return _prefixed(embedding_function, self.query_prefix)
+
+    def document_function(self, embedding_function):
+        """Returns a function that embeds a chunk with 'embedding_function' after prepending the document prefix."""
+        return _prefixed(embedding_function, self.document_prefix)
+
+    def query_cache_key(self, queries):
+        """Returns a key identifying the encoded query matrix of the given queries under this configuration."""
+
+        digest = hashlib.sha1()
+        for part in (self.model_id, self.query_prefix, *queries):
+            digest.update(part.encode('utf-8'))
+            digest.update(b'\0')
+
+        return digest.hexdigest()
+
+
+def _prefixed(embedding_function, prefix):
+
+    if not prefix:
+        return embedding_function
+
+    return lambda text: embedding_function(prefix + text)
+
+
+class EmbeddingCache:
+    """
+    Embeddings of previously embedded texts, keyed by the hash of the text.
+
+    A cache must only be shared between calls that use the same embedding function (model). Sharing it across
+    the configurations of a grid search means that chunks produced by several configurations (e.g. identical
+    windows at the same boundaries) are embedded only once for the whole sweep.
+    """
+
+    def __init__(self):
+        self.embeddings = {}
+
+    def __len__(self):
+        return len(self.embeddings)
+
+    def __contains__(self, key):
+        return key in self.embeddings
+
+
+def text_hash(text):
+    return hashlib.sha1(text.encode('utf-8')).digest()
+
+
+def embed_texts(texts, embedding_function, cache=None):
+    """
+    Embeds a list of texts, embedding each distinct text only once.
+
+    The texts are deduplicated by hashing, 'embedding_function' is called only for distinct texts that are not
+    already in 'cache', and the resulting vectors are scattered back by index into a matrix with one row per text.
+
+    Parameters:
+    ----------
+    texts (list of str): The texts to be embedded (e.g. the chunks returned by 'chunking_function').
+    embedding_function (Callable): A function that takes a string and returns its embedding.
+    cache (EmbeddingCache, optional): A cache of embeddings shared across calls with the same 'embedding_function'.
+                                      Default is None (texts are only deduplicated within this call).
+
+    Returns:
+    ----------
+    tuple: A tuple containing:
+        - embeddings (numpy.ndarray): A 2D array of shape (len(texts), embedding dimension).
+        - dedup_stats (dict): A dictionary with the following keys:
+            - 'N_texts': The number of texts.
+            - 'N_unique': The number of distinct texts.
+            - 'N_embedded': The number of calls made to 'embedding_function'.
+            - 'dedup_ratio': The fraction of texts that duplicate another text of this call.
+            - 'cache_hit_ratio': The fraction of distinct texts whose embedding was found in 'cache'.
+    """
+
+    if cache is None:
+        cache = EmbeddingCache()
+
+    unique_index = {}
+    inverse = np.empty(len(texts), dtype=np.int64)
+    N_embedded = 0
+
+    for text_index, text in enumerate(texts):
+
+        key = text_hash(text)
+
+        if key not in unique_index:
+            unique_index[key] = len(unique_index)
+
+            if key not in cache.embeddings:
+                cache.embeddings[key] = np.asarray(embedding_function(text))
+                N_embedded += 1
+
+        inverse[text_index] = unique_index[key]
+
+    unique_embeddings = np.stack([cache.embeddings[key] for key in unique_index]) if unique_index else np.empty((0, 0))
+    embeddings = unique_embeddings[inverse]
+
+    dedup_stats = {
+        'N_texts': len(texts),
+        'N_unique': len(unique_index),
+        'N_embedded': N_embedded,
+        'dedup_ratio': 1 - len(unique_index)/len(texts) if texts else 0.0,
+        'cache_hit_ratio': 1 - N_embedded/len(unique_index) if unique_index else 0.0,
+    }
+
+    return embeddings, dedup_stats
+
+
+def load_query_embeddings(corpus_id, queries, embedding_function, embedding_config, cache_dir=QUERY_CACHE_DIR):
+    """
+    Returns the encoded query matrix of a corpus, encoding the queries only once per (model, prefix, query set).
+
+    On the first call, the queries are embedded (with the query prefix of 'embedding_config') and the matrix is
+    saved as a '.npy' file in 'cache_dir'. Every later call, e.g. every trial of a sweep, memory-maps that file
+    instead of re-encoding the queries.
+
+    Parameters:
+    ----------
+    corpus_id (str): Identifier of the corpus the queries belong to.
+    queries (list of str or pandas.Series): The queries.
+    embedding_function (Callable): A function that takes a string and returns its embedding.
+    embedding_config (EmbeddingConfig): The embedding configuration (model ID and query prefix).
+    cache_dir (str, optional): The directory of the cached query matrices. Default is 'dataset/query_embeddings'.
+
+    Returns:
+    ----------
+    queries_emb (numpy.ndarray): A read-only, memory-mapped 2D array with one row per query.
+    """
+
+    queries = list(queries)
+    cache_path = os.path.join(cache_dir, f"{corpus_id}_{embedding_config.query_cache_key(queries)[:16]}.npy")
+
+    if not os.path.exists(cache_path):
+        query_function = embedding_config.query_function(embedding_function)
+        queries_emb = np.stack([np.asarray(query_function(query)) for query in queries])
+
+        os.makedirs(cache_dir, exist_ok=True)
+        tmp_path = cache_path[:-len('.npy')] + f'.{os.getpid()}.tmp.npy'
+        np.save(tmp_path, queries_emb)
+        os.replace(tmp_path, cache_path)
+
+    return np.load(cache_path, mmap_mode='r')
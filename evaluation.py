@@ -1,9 +1,9 @@
 import pandas as pd
-from evaluation_utils import *
-from visualization_utils import plot_metrics_boxplots
+from evaluation_utils import sum_of_ranges, union_ranges, intersect_two_ranges
+from chunk_table import chunk_spans
 
 
-def calculate_metrics(relevant_excerpts, retrieved_ids, chunk_metadata, show_plots=True):
+def calculate_metrics(relevant_excerpts, retrieved_ids, chunk_metadata, show_plots=False, verbose=True, overlap_matrix=None):
     """
     Calculates evaluation metrics (precision, recall, and F1 score) for the retrieved chunks based on the relevant excerpts.
 
@@ -18,8 +18,14 @@ def calculate_metrics(relevant_excerpts, retrieved_ids, chunk_metadata, show_plo
                                             indicating the range of the excerpt in the original document.
     retrieved_ids (numpy.ndarray): A 2D array where each row represents a query and each column contains the ID of a retrieved chunk.
                                    The IDs correspond to the index in 'chunk_metadata'.
-    chunk_metadata (list of dicts): A list of dictionaries containing metadata for each chunk, including 'start_index' and 'end_index'.
-    show_plots (bool, optional): If True, displays boxplots of the precision, recall, and F1 scores. Default is True.
+    chunk_metadata (ChunkTable or list of dicts): The metadata for each chunk (see 'chunking_function'), or a list of dictionaries
+                                                  containing metadata for each chunk, including 'start_index' and 'end_index'.
+    show_plots (bool, optional): If True, displays boxplots of the precision, recall, and F1 scores. Default is False
+                                 (plots of whole sweeps are rendered afterwards, see 'report').
+    verbose (bool, optional): If True, prints the summary statistics of the metrics. Default is True.
+    overlap_matrix (ChunkExcerptOverlap, optional): The precomputed chunk/excerpt overlaps of this chunking (see 'build_overlap_matrix').
+                                                    If given, the metrics are computed with sparse row gathers instead of
+                                                    intersecting every retrieved chunk with every reference. Default is None.
 
     Returns:
     ----------
@@ -29,51 +35,57 @@ def calculate_metrics(relevant_excerpts, retrieved_ids, chunk_metadata, show_plo
         - highlighted_chunks_count (list): A list of the number of highlighted chunks for each query.
     """
 
-    N_queries, _ = retrieved_ids.shape
+    if overlap_matrix is not None:
+        precision_scores, recall_scores, f1_scores, highlighted_chunks_count = overlap_matrix.evaluate(retrieved_ids, chunk_metadata)
+        highlighted_chunks_count = highlighted_chunks_count.tolist()
 
-    precision_scores = []
-    recall_scores = []
-    f1_scores = []
+    else:
+        N_queries, _ = retrieved_ids.shape
 
-    highlighted_chunks_count = []
+        chunk_starts, chunk_ends = chunk_spans(chunk_metadata, retrieved_ids)
+        chunk_starts = chunk_starts.tolist()
+        chunk_ends = chunk_ends.tolist()
 
-    for query_index in range(N_queries):
+        precision_scores = []
+        recall_scores = []
+        f1_scores = []
 
-        references = relevant_excerpts[query_index]
+        highlighted_chunks_count = []
 
-        used_highlights = []
-        highlighted_chunk_count = 0
+        for query_index in range(N_queries):
 
-        for id in retrieved_ids[query_index,:]:
+            references = relevant_excerpts[query_index]
 
-            chunk_start = chunk_metadata[id]["start_index"]
-            chunk_end = chunk_metadata[id]["end_index"]
+            used_highlights = []
+            highlighted_chunk_count = 0
 
-            contains_highlight = False
+            for chunk_start, chunk_end in zip(chunk_starts[query_index], chunk_ends[query_index]):
 
-            for reference in references:
+                contains_highlight = False
 
-                ref_start = int(reference["start_index"])
-                ref_end = int(reference["end_index"])
+                for reference in references:
 
-                intersection = intersect_two_ranges((chunk_start, chunk_end), (ref_start, ref_end))
+                    ref_start = int(reference["start_index"])
+                    ref_end = int(reference["end_index"])
+
+                    intersection = intersect_two_ranges((chunk_start, chunk_end), (ref_start, ref_end))
     
-                if intersection is not None:
-                    contains_highlight = True
-                    used_highlights = union_ranges([*used_highlights, intersection])
+                    if intersection is not None:
+                        contains_highlight = True
+                        used_highlights = union_ranges([*used_highlights, intersection])
 
-            if contains_highlight:
-                    highlighted_chunk_count += 1
+                if contains_highlight:
+                        highlighted_chunk_count += 1
 
-        highlighted_chunks_count.append(highlighted_chunk_count)
+            highlighted_chunks_count.append(highlighted_chunk_count)
 
-        precision = sum_of_ranges(used_highlights)/sum_of_ranges([(chunk_metadata[id]["start_index"], chunk_metadata[id]["end_index"]) for id in retrieved_ids[query_index,:]])
-        recall = sum_of_ranges(used_highlights)/sum_of_ranges([(int(ref["start_index"]), int(ref["end_index"])) for ref in references])
-        f1 = 2*precision*recall/(precision+recall) if (precision or recall) else 0
+            precision = sum_of_ranges(used_highlights)/sum_of_ranges(zip(chunk_starts[query_index], chunk_ends[query_index]))
+            recall = sum_of_ranges(used_highlights)/sum_of_ranges([(int(ref["start_index"]), int(ref["end_index"])) for ref in references])
+            f1 = 2*precision*recall/(precision+recall) if (precision or recall) else 0
 
-        precision_scores.append(precision)
-        recall_scores.append(recall)
-        f1_scores.append(f1)
+            precision_scores.append(precision)
+            recall_scores.append(recall)
+            f1_scores.append(f1)
 
     metrics = pd.DataFrame({
         'precision': precision_scores,
@@ -81,6 +93,32 @@ def calculate_metrics(relevant_excerpts, retrieved_ids, chunk_metadata, show_plo
         'f1_score': f1_scores
     })
 
+    metrics_summary = summarize_metrics(metrics)
+
+    if verbose:
+        print_metrics_summary(metrics_summary)
+
+    if show_plots:
+        # Imported lazily so that matplotlib is only loaded when plots are requested
+        from visualization_utils import plot_metrics_boxplots
+        plot_metrics_boxplots(metrics)
+
+    return metrics, metrics_summary, highlighted_chunks_count
+
+
+def summarize_metrics(metrics):
+    """
+    Computes the mean and standard deviation (in percent) of the per-query precision, recall, and F1 scores.
+
+    Parameters:
+    ----------
+    metrics (pandas.DataFrame): A DataFrame with 'precision', 'recall', and 'f1_score' columns, one row per query.
+
+    Returns:
+    ----------
+    metrics_summary (pandas.DataFrame): A single-row DataFrame with the mean and standard deviation of each metric.
+    """
+
     metrics_summary = pd.DataFrame({
         'precision_mean': [metrics['precision'].mean()*100],
         'precision_std': [metrics['precision'].std()*100],
@@ -90,12 +128,12 @@ def calculate_metrics(relevant_excerpts, retrieved_ids, chunk_metadata, show_plo
         'f1_std': [metrics['f1_score'].std()*100]
     })
 
+    return metrics_summary
+
+
+def print_metrics_summary(metrics_summary):
+
     print('Evaluation results:')
     print('\tPrecision: {:.2f} ± {:.2f} %'.format(metrics_summary['precision_mean'].values[0], metrics_summary['precision_std'].values[0]))
     print('\tRecall: {:.2f} ± {:.2f} %'.format(metrics_summary['recall_mean'].values[0], metrics_summary['recall_std'].values[0]))
     print('\tF1 score: {:.2f} ± {:.2f} %'.format(metrics_summary['f1_mean'].values[0], metrics_summary['f1_std'].values[0]))
-
-    if show_plots:
-        plot_metrics_boxplots(metrics)
-
-    return metrics, metrics_summary, highlighted_chunks_count
\ No newline at end of file
@@ -1,14 +1,33 @@
 
+import os
 import itertools
 import pandas as pd
 import datetime
-from retrieval_evaluation_pipeline import *
+import numpy as np
+from retrieval_evaluation_pipeline import retrieval_evaluation_pipeline
+from pipeline_utils import read_dataset
+from embedding_utils import EmbeddingCache, load_query_embeddings
 
-def grid_search(corpus_id, chunker, embedding_function, chunk_size_values, overlap_percentages, Nr_values):
+def grid_search(corpus_id, chunker, embedding_function, chunk_size_values, overlap_percentages, Nr_values, output_dir='.',
+                embedding_config=None):
     
     results = {}
     results_str = pd.DataFrame(columns=['chunk_size', 'chunk_overlap', 'Nr', 'precision', 'recall', 'f1'])
 
+    # Chunk embeddings are shared across configurations, identical chunks are embedded only once
+    embedding_cache = EmbeddingCache()
+
+    # Chunk/excerpt overlaps are computed once per chunking and reused for every Nr
+    overlap_cache = {}
+
+    # The queries do not depend on the configuration: encoded once (or loaded from the cache of encoded queries
+    # when an embedding configuration is given) and reused by every trial
+    _, queries, _ = read_dataset(corpus_id)
+    if embedding_config is not None:
+        query_embeddings = load_query_embeddings(corpus_id, queries, embedding_function, embedding_config)
+    else:
+        query_embeddings = np.stack([np.asarray(embedding_function(query)) for query in queries])
+
     param_combinations = itertools.product(chunk_size_values, overlap_percentages, Nr_values)
 
     for chunk_size, overlap_percentage, Nr in param_combinations:
@@ -19,7 +38,9 @@ def grid_search(corpus_id, chunker, embedding_function, chunk_size_values, overl
         chunker.chunk_size = chunk_size
         chunker.chunk_overlap = chunk_overlap
         
-        metrics, metrics_summary = retrieval_evaluation_pipeline(corpus_id, chunker, embedding_function, Nr, show_plots=False)
+        metrics, metrics_summary = retrieval_evaluation_pipeline(corpus_id, chunker, embedding_function, Nr, show_plots=False,
+                                                                 embedding_cache=embedding_cache, embedding_config=embedding_config,
+                                                                 query_embeddings=query_embeddings, overlap_cache=overlap_cache)
         
         results[(chunk_size, chunk_overlap, Nr)] = {
             'precision_mean': metrics_summary['precision_mean'].item(),
@@ -41,7 +62,7 @@ def grid_search(corpus_id, chunker, embedding_function, chunk_size_values, overl
         results_str = pd.concat([results_str, pd.DataFrame([row])], ignore_index=True)
 
     timestamp = datetime.datetime.now().strftime("%Y%m%d_%H%M%S")
-    results_str.to_csv(f"results_{timestamp}.csv", index=False)
+    results_str.to_csv(os.path.join(output_dir, f"results_{timestamp}.csv"), index=False)
     
     return results, results_str
 
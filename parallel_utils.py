@@ -0,0 +1,203 @@
+import os
+import numpy as np
+import pandas as pd
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import shared_memory
+from pipeline_utils import retrieval_function, streaming_retrieval_function, normalize_embeddings
+from chunk_table import ChunkTable
+from evaluation import calculate_metrics, summarize_metrics, print_metrics_summary
+
+
+# Arrays attached by a worker process, keyed by name: (handle, array)
+_shared_arrays = {}
+
+
+def publish_array(array, memmap_path=None):
+    """
+    Publishes a NumPy array once so that worker processes can attach to it without copying.
+
+    By default the array is copied into a 'multiprocessing.shared_memory' block. If 'memmap_path' is given,
+    the array is written to a '.npy' file instead and workers attach to it as a read-only memory map.
+
+    Parameters:
+    ----------
+    array (numpy.ndarray or list): The array to be published.
+    memmap_path (str, optional): Path of the '.npy' file to write the array to. Default is None (shared memory).
+
+    Returns:
+    ----------
+    tuple: A tuple containing:
+        - handle (multiprocessing.shared_memory.SharedMemory or None): The shared memory block owned by the caller,
+                                                                        to be passed to 'release_array' when done.
+        - descriptor (dict): A picklable description of the published array, to be passed to 'attach_array'.
+    """
+
+    array = np.ascontiguousarray(array)
+
+    if memmap_path is not None:
+        if not memmap_path.endswith('.npy'):
+            memmap_path += '.npy'
+        np.save(memmap_path, array)
+        return None, {'path': memmap_path, 'shape': array.shape, 'dtype': array.dtype.str}
+
+    shm = shared_memory.SharedMemory(create=True, size=max(array.nbytes, 1))
+    shared_array = np.ndarray(array.shape, dtype=array.dtype, buffer=shm.buf)
+    shared_array[...] = array
+
+    return shm, {'name': shm.name, 'shape': array.shape, 'dtype': array.dtype.str}
+
+
+def attach_array(descriptor):
+    """
+    Attaches to an array published by 'publish_array' without copying its data.
+
+    Parameters:
+    ----------
+    descriptor (dict): The descriptor returned by 'publish_array'.
+
+    Returns:
+    ----------
+    tuple: A tuple containing:
+        - handle (multiprocessing.shared_memory.SharedMemory or None): The attached shared memory block, which must be
+                                                                        kept alive for as long as the array is used.
+        - array (numpy.ndarray): A read-only view of the published array.
+    """
+
+    if 'path' in descriptor:
+        return None, np.load(descriptor['path'], mmap_mode='r')
+
+    shm = shared_memory.SharedMemory(name=descriptor['name'])
+    array = np.ndarray(descriptor['shape'], dtype=np.dtype(descriptor['dtype']), buffer=shm.buf)
+    array.flags.writeable = False
+
+    return shm, array
+
+
+def release_array(handle, descriptor):
+    """
+    Frees an array published by 'publish_array' (unlinks the shared memory block or removes the '.npy' file).
+    """
+
+    if handle is not None:
+        handle.close()
+        handle.unlink()
+    elif 'path' in descriptor and os.path.exists(descriptor['path']):
+        os.remove(descriptor['path'])
+
+
+def _init_worker(descriptors):
+
+    for key, descriptor in descriptors.items():
+        _shared_arrays[key] = attach_array(descriptor)
+
+
+def _retrieve_shard(start, stop, Nr, memory_budget):
+
+    _, queries_emb = _shared_arrays['queries_emb']
+    _, chunks_emb = _shared_arrays['chunks_emb']
+
+    # The published embeddings are already normalized, so the shared chunk matrix is scored without being copied
+    if memory_budget is None:
+        retrieved_ids, _ = retrieval_function(queries_emb[start:stop], chunks_emb, Nr, normalized=True)
+    else:
+        retrieved_ids, _ = streaming_retrieval_function(queries_emb[start:stop], chunks_emb, Nr, memory_budget, normalized=True)
+
+    return retrieved_ids
+
+
+def _evaluate_shard(start, stop, relevant_excerpts, Nr, memory_budget):
+
+    _, chunk_array = _shared_arrays['chunk_table']
+
+    retrieved_ids = _retrieve_shard(start, stop, Nr, memory_budget)
+
+    metrics, _, highlighted_chunks_count = calculate_metrics(relevant_excerpts, retrieved_ids, ChunkTable.from_array(chunk_array),
+                                                             show_plots=False, verbose=False)
+
+    return metrics, highlighted_chunks_count
+
+
+def parallel_evaluation(queries_emb, chunks_emb, chunk_metadata, relevant_excerpts, Nr, n_workers, memmap_dir=None, show_plots=False,
+                        memory_budget=None, overlap_matrix=None):
+    """
+    Retrieves the top-N chunks for each query and evaluates them, sharding the queries across worker processes.
+
+    The query embeddings, chunk embeddings and chunk table are published once (in shared memory, or as memory-mapped
+    '.npy' files in 'memmap_dir') and every worker attaches to them zero-copy, so memory stays flat as the number of
+    workers grows. The embeddings are normalized before they are published, so that the workers score against the
+    shared chunk matrix directly instead of each making its own normalized copy. Each worker runs 'retrieval_function'
+    and 'calculate_metrics' on a contiguous block of queries, and the per-query metrics are merged in query order.
+    If an overlap matrix is given, the workers only retrieve, and the merged retrieved IDs are evaluated against it
+    in the calling process.
+
+    Parameters:
+    ----------
+    queries_emb (numpy.ndarray or list): A 2D array or list of query embeddings.
+    chunks_emb (numpy.ndarray or list): A 2D array or list of chunk embeddings.
+    chunk_metadata (ChunkTable or list of dicts): Metadata for each chunk, including 'start_index' and 'end_index'.
+    relevant_excerpts (list or pandas.Series): The relevant excerpts for each query, in the same order as 'queries_emb'.
+    Nr (int): The number of top relevant chunks to retrieve for each query.
+    n_workers (int): The number of worker processes.
+    memmap_dir (str, optional): Directory for memory-mapped '.npy' files. Default is None (shared memory is used).
+    show_plots (bool, optional): Whether or not to display boxplots of the metrics. Default is False.
+    memory_budget (int, optional): If given, each worker retrieves with 'streaming_retrieval_function' within this many bytes
+                                   of scoring memory. Default is None (dense scoring with 'retrieval_function').
+    overlap_matrix (ChunkExcerptOverlap, optional): The chunk/excerpt overlaps of this chunking (see 'build_overlap_matrix'),
+                                                    used to evaluate the retrieved IDs. Default is None.
+
+    Returns:
+    ----------
+    tuple: The same as 'calculate_metrics':
+        - metrics (pandas.DataFrame): A DataFrame with precision, recall, and F1 score for each query.
+        - metrics_summary (pandas.DataFrame): A DataFrame with the mean and standard deviation of the metrics.
+        - highlighted_chunks_count (list): A list of the number of highlighted chunks for each query.
+    """
+
+    relevant_excerpts = list(relevant_excerpts)
+
+    if not isinstance(chunk_metadata, ChunkTable):
+        chunk_metadata = ChunkTable.from_dicts(chunk_metadata)
+
+    arrays = {
+        'queries_emb': normalize_embeddings(queries_emb),
+        'chunks_emb': normalize_embeddings(chunks_emb),
+        'chunk_table': chunk_metadata.to_array(),
+    }
+
+    published = {}
+    try:
+        for key, array in arrays.items():
+            memmap_path = os.path.join(memmap_dir, key + '_' + str(os.getpid())) if memmap_dir is not None else None
+            published[key] = publish_array(array, memmap_path)
+        del arrays
+
+        descriptors = {key: descriptor for key, (_, descriptor) in published.items()}
+        shards = np.array_split(np.arange(len(relevant_excerpts)), n_workers)
+
+        with ProcessPoolExecutor(max_workers=n_workers, initializer=_init_worker, initargs=(descriptors,)) as executor:
+            if overlap_matrix is None:
+                futures = [executor.submit(_evaluate_shard, shard[0], shard[-1] + 1, relevant_excerpts[shard[0]:shard[-1] + 1],
+                                           Nr, memory_budget)
+                           for shard in shards if len(shard) > 0]
+            else:
+                futures = [executor.submit(_retrieve_shard, shard[0], shard[-1] + 1, Nr, memory_budget)
+                           for shard in shards if len(shard) > 0]
+            results = [future.result() for future in futures]
+    finally:
+        for handle, descriptor in published.values():
+            release_array(handle, descriptor)
+
+    if overlap_matrix is not None:
+        return calculate_metrics(relevant_excerpts, np.concatenate(results), chunk_metadata, show_plots, overlap_matrix=overlap_matrix)
+
+    metrics = pd.concat([shard_metrics for shard_metrics, _ in results], ignore_index=True)
+    highlighted_chunks_count = [count for _, shard_counts in results for count in shard_counts]
+
+    metrics_summary = summarize_metrics(metrics)
+    print_metrics_summary(metrics_summary)
+
+    if show_plots:
+        from visualization_utils import plot_metrics_boxplots
+        plot_metrics_boxplots(metrics)
+
+    return metrics, metrics_summary, highlighted_chunks_count
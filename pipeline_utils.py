@@ -2,11 +2,11 @@ import os
 import pandas as pd
 import numpy as np
 import json
-from sentence_transformers import SentenceTransformer, util
-from evaluation_utils import *
+from evaluation_utils import find_target_in_document
+from chunk_table import ChunkTable
 
 
-def read_dataset(corpus_id):
+def read_dataset(corpus_id, questions_df=None):
     """
     Loads a dataset based on the given corpus ID and returns the relevant information for further processing.
 
@@ -19,6 +19,8 @@ def read_dataset(corpus_id):
     Parameters:
     ----------
     corpus_id (str): The ID of the corpus to be loaded. This ID determines which dataset is read.
+    questions_df (pandas.DataFrame, optional): The already loaded content of 'questions_df.csv', to avoid re-reading it
+                                               when several corpora are loaded. Default is None (the file is read).
 
     Returns:
     ----------
@@ -36,7 +38,8 @@ def read_dataset(corpus_id):
     with open(md_file, "r", encoding="utf-8") as file:
         corpora = file.read()
 
-    questions_df = pd.read_csv(os.path.join('dataset','questions_df.csv'))
+    if questions_df is None:
+        questions_df = pd.read_csv(os.path.join('dataset','questions_df.csv'))
 
     relevant_questions_df = questions_df[questions_df.iloc[:,-1] == corpus_id]
 
@@ -49,7 +52,7 @@ def read_dataset(corpus_id):
     return corpora, queries, relevant_excerpts
 
 
-def chunking_function(corpora, chunker):
+def chunking_function(corpora, chunker, corpus_index=0, count_tokens=False):
     """
     Splits the given text (corpora) into chunks and generates metadata for each chunk.
 
@@ -63,29 +66,50 @@ def chunking_function(corpora, chunker):
     chunker (object): A chunker object that implements the 'split_text' method to divide the text into chunks. 
                       An example of such a chunker is 'FixedTokenChunker' from:
                       https://github.com/brandonstarxel/chunking_evaluation/blob/main/chunking_evaluation/chunking/fixed_token_chunker.py
+    corpus_index (int, optional): The index of the corpus, stored in the 'corpus_id' column of the metadata. Default is 0.
+    count_tokens (bool, optional): If True and the chunker exposes a tiktoken tokenizer, the number of tokens per chunk
+                                   is stored in the 'token_count' column of the metadata (otherwise it is -1). Default is False.
 
     Returns:
     ----------
     tuple: A tuple containing:
         - chunks (list): A list of text chunks obtained by splitting the input 'corpora'.
-        - chunk_metadata (list): A list of dictionaries, each containing metadata for a chunk with the following keys:
+        - chunk_metadata (ChunkTable): An array-backed table with the metadata of each chunk. Indexing it with a chunk ID
+                                       returns a dictionary with the following keys:
             - 'start_index': The index where the chunk starts in the original 'corpora'.
             - 'end_index': The index where the chunk ends in the original 'corpora'.
     """
 
     chunks = chunker.split_text(corpora)
-    chunk_metadata = []
 
-    for chunk in chunks:
+    N_chunks = len(chunks)
+    start = np.empty(N_chunks, dtype=np.int64)
+    end = np.empty(N_chunks, dtype=np.int64)
 
-        start_ind, end_ind = find_target_in_document(corpora, chunk)
+    for chunk_index, chunk in enumerate(chunks):
 
-        chunk_metadata.append({"start_index": start_ind, "end_index": end_ind})
+        start[chunk_index], end[chunk_index] = find_target_in_document(corpora, chunk)
+
+    token_count = None
+    if count_tokens and hasattr(chunker, '_tokenizer'):
+        token_count = [len(tokens) for tokens in chunker._tokenizer.encode_ordinary_batch(chunks)]
+
+    chunk_metadata = ChunkTable(start, end, token_count, np.full(N_chunks, corpus_index), corpora=corpora)
 
     return chunks, chunk_metadata
 
 
-def retrieval_function(queries_emb, chunks_emb, Nr):
+def normalize_embeddings(embeddings):
+    """
+    Scales each row of a 2D array of embeddings to unit L2 norm, so that cosine similarity reduces to a dot product.
+    """
+
+    embeddings = np.atleast_2d(np.asarray(embeddings))
+
+    return embeddings / np.maximum(np.linalg.norm(embeddings, axis=1, keepdims=True), 1e-12)
+
+
+def retrieval_function(queries_emb, chunks_emb, Nr, normalized=False):
     """
     Retrieves the top-N relevant chunks for each query based on cosine similarity.
 
@@ -98,6 +122,8 @@ def retrieval_function(queries_emb, chunks_emb, Nr):
     queries_emb (numpy.ndarray or list): A 2D array or list of query embeddings, where each row represents an embedding for a query.
     chunks_emb (numpy.ndarray or list): A 2D array or list of chunk embeddings, where each row represents an embedding for a chunk.
     Nr (int): The number of top relevant chunks to retrieve for each query based on cosine similarity.
+    normalized (bool, optional): If True, the embeddings are assumed to be already normalized (see 'normalize_embeddings')
+                                 and are scored as they are, without making normalized copies. Default is False.
 
     Returns:
     ----------
@@ -110,19 +136,137 @@ def retrieval_function(queries_emb, chunks_emb, Nr):
 
     """
 
-    Nq = len(queries_emb)
+    # Cosine similarity computed with NumPy, so that retrieval does not require torch
+    if normalized:
+        queries_emb = np.atleast_2d(np.asarray(queries_emb))
+        chunks_emb = np.atleast_2d(np.asarray(chunks_emb))
+    else:
+        queries_emb = normalize_embeddings(queries_emb)
+        chunks_emb = normalize_embeddings(chunks_emb)
+
+    all_cos_scores = queries_emb @ chunks_emb.T
+
+    Nr = min(Nr, all_cos_scores.shape[1])
+    rows = np.arange(all_cos_scores.shape[0])[:, None]
+
+    # Partial sort: select the top-Nr candidates per query, then order only those by decreasing score
+    top_ids = np.argpartition(-all_cos_scores, Nr - 1, axis=1)[:, :Nr]
+    order = np.argsort(-all_cos_scores[rows, top_ids], axis=1, kind='stable')
+    top_ids = top_ids[rows, order]
+    cos_scores = all_cos_scores[rows, top_ids]
+
+    return top_ids, cos_scores
+
+
+def streaming_retrieval_function(queries_emb, chunks_emb, Nr, memory_budget, normalized=False):
+    """
+    Retrieves the top-N relevant chunks for each query based on cosine similarity, within a bounded amount of memory.
+
+    Unlike 'retrieval_function', the dense (Nq, Nc) score matrix is never materialized. The chunk embeddings are
+    streamed in tiles (e.g. from memory-mapped shards), each tile is scored against blocks of queries, and the tile's
+    best candidates are merged into a running per-query top-N with vectorized partial sorts. The tile and query block
+    sizes are chosen so that the working memory stays within 'memory_budget'.
+
+    Parameters:
+    ----------
+    queries_emb (numpy.ndarray or list): A 2D array or list of query embeddings, where each row represents an embedding for a query.
+    chunks_emb (numpy.ndarray or list): A 2D array (e.g. a 'numpy.memmap') or list of chunk embeddings, or a list of 2D arrays
+                                        (shards) or of paths to '.npy' shards, which are memory-mapped. Chunk IDs follow the shard order.
+    Nr (int): The number of top relevant chunks to retrieve for each query based on cosine similarity.
+    memory_budget (int): The approximate amount of working memory (in bytes) to be used for scoring, not counting the query matrix.
+    normalized (bool, optional): If True, the embeddings are assumed to be already normalized (see 'normalize_embeddings'),
+                                 so the chunk tiles are scored in place without being copied. Default is False.
+
+    Returns:
+    ----------
+    tuple: The same as 'retrieval_function':
+        - top_ids (numpy.ndarray): A 2D array of shape (Nq, Nr) with the indices of the top-N chunks for each query.
+        - cos_scores (numpy.ndarray): A 2D array of shape (Nq, Nr) with the corresponding cosine similarity scores.
+    """
+
+    queries_emb = np.atleast_2d(np.asarray(queries_emb))
+
+    if isinstance(chunks_emb, np.ndarray):
+        shards = [chunks_emb]
+    elif len(chunks_emb) > 0 and all(isinstance(shard, str) or np.ndim(shard) == 2 for shard in chunks_emb):
+        shards = [np.load(shard, mmap_mode='r') if isinstance(shard, str) else np.asarray(shard) for shard in chunks_emb]
+    else:
+        # A list of per-chunk vectors (as accepted by 'retrieval_function') is a single shard
+        shards = [np.atleast_2d(np.asarray(chunks_emb))]
+
+    N_queries, dim = queries_emb.shape
+    N_chunks = sum(len(shard) for shard in shards)
+    Nr = min(Nr, N_chunks)
+
+    query_block, chunk_tile = _tile_sizes(N_queries, dim, Nr, memory_budget)
+
+    # Normalized once, rather than once per (tile, query block) pair
+    if not normalized:
+        queries_emb = normalize_embeddings(queries_emb)
+
+    # Running top-Nr per query (unordered until the end)
+    top_ids = np.full((N_queries, Nr), -1, dtype=np.int64)
+    cos_scores = np.full((N_queries, Nr), -np.inf)
+
+    offset = 0
+    for shard in shards:
+        for tile_start in range(0, len(shard), chunk_tile):
+
+            tile = np.asarray(shard[tile_start:tile_start + chunk_tile])
+            if not normalized:
+                tile = normalize_embeddings(tile)
+            tile_ids = np.arange(offset + tile_start, offset + tile_start + len(tile))
+
+            for query_start in range(0, N_queries, query_block):
 
-    top_ids = np.zeros((Nq,Nr))
-    cos_scores = np.zeros((Nq,Nr))
+                query_stop = min(query_start + query_block, N_queries)
+                scores = queries_emb[query_start:query_stop] @ tile.T
 
-    for i in range(Nq):
+                # Best candidates of the tile, merged with the running top-Nr
+                if scores.shape[1] > Nr:
+                    candidates = np.argpartition(-scores, Nr - 1, axis=1)[:, :Nr]
+                    scores = np.take_along_axis(scores, candidates, axis=1)
+                    candidate_ids = tile_ids[candidates]
+                else:
+                    candidate_ids = np.broadcast_to(tile_ids, scores.shape)
 
-        cos_scores_tmp = util.pytorch_cos_sim(queries_emb[i], chunks_emb)[0].numpy()
-        top_ids_tmp = np.argsort(cos_scores_tmp, axis=0)[::-1][:Nr]
-        
-        top_ids[i,:] = top_ids_tmp
-        cos_scores[i,:] = cos_scores_tmp[top_ids_tmp]
+                merged_scores = np.concatenate([cos_scores[query_start:query_stop], scores], axis=1)
+                merged_ids = np.concatenate([top_ids[query_start:query_stop], candidate_ids], axis=1)
 
-    top_ids = top_ids.astype(int)
+                best = np.argpartition(-merged_scores, Nr - 1, axis=1)[:, :Nr]
+                cos_scores[query_start:query_stop] = np.take_along_axis(merged_scores, best, axis=1)
+                top_ids[query_start:query_stop] = np.take_along_axis(merged_ids, best, axis=1)
+
+        offset += len(shard)
+
+    order = np.argsort(-cos_scores, axis=1, kind='stable')
+    top_ids = np.take_along_axis(top_ids, order, axis=1)
+    cos_scores = np.take_along_axis(cos_scores, order, axis=1)
 
     return top_ids, cos_scores
+
+
+def _tile_sizes(N_queries, dim, Nr, memory_budget):
+    """
+    Chooses the query block and chunk tile sizes (in rows) for 'streaming_retrieval_function'.
+
+    Per chunk row of a tile, the normalized tile takes 'dim' values and the score block and its partial-sort
+    indices take 2 values per query of the block; the merge buffers are a fixed cost per query of the block.
+    All values are counted as 8 bytes. The query block is halved until a tile holds at least Nr rows, and a
+    ValueError is raised if the budget cannot hold such a tile even for a single query.
+    """
+
+    query_block = max(1, min(N_queries, 1024))
+
+    while True:
+        fixed_cost = 8*query_block*4*Nr
+        chunk_tile = (memory_budget - fixed_cost) // (8*(dim + 2*query_block))
+
+        if chunk_tile >= max(Nr, 1):
+            break
+        if query_block == 1:
+            raise ValueError(f"A memory budget of {memory_budget} bytes cannot hold a tile of {max(Nr, 1)} chunks "
+                             f"(embedding dimension {dim}), at least {fixed_cost + 8*(dim + 2)*max(Nr, 1)} bytes are needed.")
+        query_block = max(1, query_block // 2)
+
+    return query_block, int(chunk_tile)
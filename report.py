@@ -0,0 +1,111 @@
+import os
+import sys
+import argparse
+import multiprocessing
+import pandas as pd
+
+
+METRICS = ['precision', 'recall', 'f1']
+
+
+def render_sweep_report(output_dir, report_dir=None):
+    """
+    Renders all plots of a sweep stored by 'run_sweep' to files, with the caller's matplotlib backend
+    (see 'render_headless_report' to render with the non-interactive Agg backend).
+
+    The sweep results ('results.csv') are read once, and the following figures are written as PNG files:
+    - 'boxplots/<trial_id>.png': Boxplots of the per-query metrics of each trial.
+    - 'heatmaps/<corpus_id>_nr<Nr>_<metric>.png': Heatmaps of the mean metrics over (chunk_size, overlap) for each Nr.
+    - 'nr_curves/<corpus_id>_<metric>.png': The mean metrics as a function of Nr for each chunking configuration.
+
+    Parameters:
+    ----------
+    output_dir (str): The output directory of the sweep.
+    report_dir (str, optional): The directory in which the figures are written. Default is None ('<output_dir>/report').
+
+    Returns:
+    ----------
+    figure_paths (list of str): The paths of the rendered figures.
+    """
+
+    from visualization_utils import plot_metrics_boxplots, plot_metric_heatmap, plot_Nr_curves
+
+    if report_dir is None:
+        report_dir = os.path.join(output_dir, 'report')
+
+    for subdir in ('boxplots', 'heatmaps', 'nr_curves'):
+        os.makedirs(os.path.join(report_dir, subdir), exist_ok=True)
+
+    results = pd.read_csv(os.path.join(output_dir, 'results.csv'))
+    figure_paths = []
+
+    for trial_id in results['trial_id']:
+        metrics = pd.read_csv(os.path.join(output_dir, 'trials', trial_id + '.csv'), index_col='query_index')
+        figure_path = os.path.join(report_dir, 'boxplots', trial_id + '.png')
+        plot_metrics_boxplots(metrics, save_path=figure_path)
+        figure_paths.append(figure_path)
+
+    for corpus_id, corpus_results in results.groupby('corpus_id'):
+
+        for Nr, Nr_results in corpus_results.groupby('Nr'):
+            for metric in METRICS:
+                figure_path = os.path.join(report_dir, 'heatmaps', f'{corpus_id}_nr{Nr}_{metric}.png')
+                plot_metric_heatmap(Nr_results, metric, save_path=figure_path)
+                figure_paths.append(figure_path)
+
+        for metric in METRICS:
+            figure_path = os.path.join(report_dir, 'nr_curves', f'{corpus_id}_{metric}.png')
+            plot_Nr_curves(corpus_results, metric, save_path=figure_path)
+            figure_paths.append(figure_path)
+
+    print(f"Rendered {len(figure_paths)} figures into '{report_dir}'.")
+
+    return figure_paths
+
+
+def render_headless_report(output_dir, report_dir=None):
+    """
+    Renders the sweep report (see 'render_sweep_report') with the non-interactive Agg backend.
+
+    Selecting the backend affects the whole process, so this is only meant for processes that do not display
+    figures, i.e. the command-line entry points and the process started by 'start_report_process'.
+    """
+
+    # The backend must be selected before pyplot is imported (by visualization_utils)
+    import matplotlib
+    matplotlib.use('Agg')
+
+    return render_sweep_report(output_dir, report_dir)
+
+
+def start_report_process(output_dir, report_dir=None):
+    """
+    Renders the sweep report (see 'render_sweep_report') in a background process, so that it does not block the caller.
+
+    Returns:
+    ----------
+    process (multiprocessing.Process): The started process; call 'join' on it to wait for the report.
+    """
+
+    # A fresh interpreter, so that the Agg backend is neither affected by nor affects the backend of the caller
+    context = multiprocessing.get_context('spawn')
+    process = context.Process(target=render_headless_report, args=(output_dir, report_dir))
+    process.start()
+
+    return process
+
+
+def main(argv=None):
+
+    parser = argparse.ArgumentParser(description="Renders the plots of a sweep stored by 'run_sweep'.")
+    parser.add_argument('output_dir', help="The output directory of the sweep.")
+    parser.add_argument('--report-dir', default=None, help="Directory for the figures (default: '<output_dir>/report').")
+    args = parser.parse_args(argv)
+
+    render_headless_report(args.output_dir, args.report_dir)
+
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
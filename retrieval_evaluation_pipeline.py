@@ -1,7 +1,14 @@
-from pipeline_utils import read_dataset, chunking_function, retrieval_function
+import time
+import hashlib
+from pipeline_utils import read_dataset, chunking_function, retrieval_function, streaming_retrieval_function
 from evaluation import calculate_metrics
+from parallel_utils import parallel_evaluation
+from embedding_utils import embed_texts, load_query_embeddings
+from overlap_matrix import build_overlap_matrix
 
-def retrieval_evaluation_pipeline(corpus_id, chunker, embedding_function, N, show_plots=False):
+def retrieval_evaluation_pipeline(corpus_id, chunker, embedding_function, N, show_plots=False, n_workers=1, memmap_dir=None,
+                                  trial_stats=None, embedding_cache=None, embedding_config=None, query_embeddings=None,
+                                  memory_budget=None, overlap_cache=None):
     """
     Executes a full retrieval evaluation pipeline, including data loading, chunking, embedding, retrieval, and evaluation.
 
@@ -18,6 +25,30 @@ def retrieval_evaluation_pipeline(corpus_id, chunker, embedding_function, N, sho
     embedding_function (Callable): A function that takes a string and returns its embedding (vector representation) via a pre-trained sentence transformer model.
     N (int): Number of top retrieved chunks per query to return. This controls the retrieval depth.
     show_plots (bool, optional): Whether or not to display boxplots of the precision, recall, and F1-score metrics. Default is False.
+    n_workers (int, optional): Number of worker processes across which the queries are sharded for retrieval and evaluation.
+                               The embeddings are shared with the workers zero-copy (see 'parallel_evaluation'). Default is 1.
+    memmap_dir (str, optional): If given, the embeddings are shared with the workers as memory-mapped '.npy' files in this
+                                directory instead of shared memory blocks. Only used when 'n_workers' > 1. Default is None.
+    trial_stats (dict, optional): If given, it is filled with statistics of the run under the following keys:
+                                  - 'timings': A dictionary with the wall-clock time (in seconds) of each pipeline stage.
+                                  - 'N_chunks': The number of chunks.
+                                  - 'embedding': The chunk deduplication statistics returned by 'embed_texts' (incl.
+                                                 'dedup_ratio' and 'cache_hit_ratio').
+                                  Default is None.
+    embedding_cache (EmbeddingCache, optional): Cache of chunk embeddings shared across calls with the same 'embedding_function'
+                                                (e.g. across the configurations of a grid search). Identical chunks are embedded
+                                                only once per call in any case. Default is None.
+    embedding_config (EmbeddingConfig, optional): Query and document prefixes for asymmetric models. If given, the encoded
+                                                  queries are cached on disk per (model, prefix, query set) and memory-mapped
+                                                  on later calls (see 'load_query_embeddings'). Default is None.
+    query_embeddings (numpy.ndarray, optional): Precomputed query embeddings, one row per query. If given, the queries are
+                                                not embedded. Default is None.
+    memory_budget (int, optional): If given, retrieval streams over tiles of the chunk embeddings with a running top-N
+                                   (see 'streaming_retrieval_function'), keeping the scoring memory within this many bytes
+                                   instead of materializing the full query-chunk score matrix. Default is None.
+    overlap_cache (dict, optional): Cache of chunk/excerpt overlap matrices (see 'build_overlap_matrix') shared across calls,
+                                    keyed by corpus and chunk spans. If given, the overlaps are computed once per chunking and
+                                    the evaluation reduces to sparse row gathers. Default is None.
 
     Returns:
     ----------
@@ -25,20 +56,68 @@ def retrieval_evaluation_pipeline(corpus_id, chunker, embedding_function, N, sho
     metrics_summary (pandas.DataFrame): A summary DataFrame with the mean and standard deviation of precision, recall, and F1 score across all queries.
     """
 
+    timings = {}
+    stage_start = time.perf_counter()
+
+    def end_stage(stage):
+        nonlocal stage_start
+        stage_end = time.perf_counter()
+        timings[stage] = stage_end - stage_start
+        stage_start = stage_end
+
     # Data loading
     corpora, queries, relevant_excerpts = read_dataset(corpus_id)
+    end_stage('loading')
     
     # Corpora chunking
     chunks, chunk_metadata = chunking_function(corpora, chunker)
+    end_stage('chunking')
     
     # Embedding
-    chunks_emb = [embedding_function(chunk) for chunk in chunks]
-    queries_emb = [embedding_function(query) for query in queries]
-    
-    # Retrieval
-    retrieved_ids, _ = retrieval_function(queries_emb, chunks_emb, N)
-    
-    # Evaluation
-    metrics, metrics_summary, highlighted_chunks_count = calculate_metrics(relevant_excerpts, retrieved_ids, chunk_metadata, show_plots)
-    
-    return metrics, metrics_summary
\ No newline at end of file
+    if embedding_config is None:
+        chunks_emb, dedup_stats = embed_texts(chunks, embedding_function, embedding_cache)
+    else:
+        chunks_emb, dedup_stats = embed_texts(chunks, embedding_config.document_function(embedding_function), embedding_cache)
+
+    if query_embeddings is not None:
+        queries_emb = query_embeddings
+    elif embedding_config is not None:
+        queries_emb = load_query_embeddings(corpus_id, queries, embedding_function, embedding_config)
+    else:
+        queries_emb = [embedding_function(query) for query in queries]
+    end_stage('embedding')
+
+    # Chunk/excerpt overlaps, looked up or built once per chunking
+    overlap_matrix = None
+    if overlap_cache is not None:
+        chunking_key = (corpus_id, hashlib.sha1(chunk_metadata.start.tobytes() + chunk_metadata.end.tobytes()).hexdigest())
+        if chunking_key not in overlap_cache:
+            overlap_cache[chunking_key] = build_overlap_matrix(chunk_metadata, relevant_excerpts)
+        overlap_matrix = overlap_cache[chunking_key]
+    end_stage('overlaps')
+
+    if n_workers > 1:
+        # Retrieval and evaluation, sharded across worker processes
+        metrics, metrics_summary, highlighted_chunks_count = parallel_evaluation(queries_emb, chunks_emb, chunk_metadata, relevant_excerpts,
+                                                                                 N, n_workers, memmap_dir, show_plots, memory_budget,
+                                                                                 overlap_matrix)
+        end_stage('retrieval_evaluation')
+    else:
+        # Retrieval
+        if memory_budget is None:
+            retrieved_ids, _ = retrieval_function(queries_emb, chunks_emb, N)
+        else:
+            retrieved_ids, _ = streaming_retrieval_function(queries_emb, chunks_emb, N, memory_budget)
+        end_stage('retrieval')
+
+        # Evaluation
+        metrics, metrics_summary, highlighted_chunks_count = calculate_metrics(relevant_excerpts, retrieved_ids, chunk_metadata, show_plots,
+                                                                               overlap_matrix=overlap_matrix)
+        end_stage('evaluation')
+
+    if trial_stats is not None:
+        trial_stats['timings'] = timings
+        trial_stats['N_chunks'] = len(chunks)
+        trial_stats['embedding'] = dedup_stats
+
+    return metrics, metrics_summary
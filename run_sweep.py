@@ -0,0 +1,300 @@
+import os
+import sys
+import json
+import hashlib
+import time
+import argparse
+import itertools
+import pandas as pd
+from fixed_token_chunker import FixedTokenChunker
+from retrieval_evaluation_pipeline import retrieval_evaluation_pipeline
+from pipeline_utils import read_dataset
+from embedding_utils import EmbeddingCache, EmbeddingConfig, QUERY_CACHE_DIR, load_query_embeddings
+
+
+# Chunker types that can be referenced by name in a sweep spec
+CHUNKERS = {
+    'fixed_token': FixedTokenChunker,
+}
+
+SWEEP_DEFAULTS = {
+    'corpora': [],
+    'chunker': {'type': 'fixed_token', 'encoding_name': 'cl100k_base'},
+    'embedder': {'model_id': 'sentence-transformers/all-MiniLM-L6-v2', 'query_prefix': '', 'document_prefix': ''},
+    'chunk_size_values': [],
+    'overlap_percentages': [0],
+    'Nr_values': [],
+    'n_workers': 1,
+    'memory_budget_mb': None,
+    'cache_dir': None,          # model cache of the sentence transformer
+    'memmap_dir': None,         # if set, embeddings are shared with workers as '.npy' files here instead of shared memory
+    'query_cache_dir': QUERY_CACHE_DIR,
+    'output_dir': 'results',
+}
+
+MANIFEST_FILE = 'manifest.jsonl'
+
+# Spec fields that change the results of a trial beyond its own parameters (corpus, chunk size, overlap, Nr)
+RESULT_AFFECTING_FIELDS = ['chunker', 'embedder']
+
+
+def load_sweep_spec(path):
+    """
+    Loads a sweep specification from a YAML ('.yaml', '.yml') or TOML ('.toml') file.
+
+    Example (YAML):
+
+        corpora: [state_of_the_union]
+        chunker:
+          type: fixed_token
+          encoding_name: cl100k_base
+        embedder:
+          model_id: intfloat/e5-small-v2
+          query_prefix: 'query: '
+          document_prefix: 'passage: '
+        chunk_size_values: [100, 200, 300]
+        overlap_percentages: [0, 25, 50]
+        Nr_values: [1, 3, 5]
+        n_workers: 4
+        memory_budget_mb: 512
+        cache_dir: cache
+        memmap_dir: null
+        output_dir: results/sweep_01
+
+    Parameters:
+    ----------
+    path (str): Path to the sweep spec file.
+
+    Returns:
+    ----------
+    spec (dict): The sweep spec, with defaults filled in for missing keys.
+    """
+
+    extension = os.path.splitext(path)[1].lower()
+
+    if extension in ('.yaml', '.yml'):
+        import yaml
+        with open(path, "r", encoding="utf-8") as file:
+            spec = yaml.safe_load(file) or {}
+    elif extension == '.toml':
+        import tomllib
+        with open(path, "rb") as file:
+            spec = tomllib.load(file)
+    else:
+        raise ValueError(f"Unsupported sweep spec format '{extension}', expected '.yaml', '.yml' or '.toml'.")
+
+    spec = {**SWEEP_DEFAULTS, **spec}
+    spec['chunker'] = {**SWEEP_DEFAULTS['chunker'], **spec['chunker']}
+    spec['embedder'] = {**SWEEP_DEFAULTS['embedder'], **spec['embedder']}
+
+    for key in ('corpora', 'chunk_size_values', 'Nr_values'):
+        if not spec[key]:
+            raise ValueError(f"Sweep spec must define a non-empty '{key}' list.")
+
+    if spec['chunker']['type'] not in CHUNKERS:
+        raise ValueError(f"Unknown chunker type '{spec['chunker']['type']}', expected one of {sorted(CHUNKERS)}.")
+
+    return spec
+
+
+def spec_hash(spec):
+    """
+    Returns a short hash of the spec fields that affect the results of a trial (see 'RESULT_AFFECTING_FIELDS'),
+    e.g. the embedding model, the query/document prefixes and the chunker parameters such as 'encoding_name'.
+    """
+
+    fields = {key: spec[key] for key in RESULT_AFFECTING_FIELDS}
+
+    return hashlib.sha1(json.dumps(fields, sort_keys=True).encode('utf-8')).hexdigest()[:10]
+
+
+def trial_manifest(spec):
+    """
+    Expands a sweep spec into the list of trials to be run, one per (corpus, chunk_size, overlap, Nr) combination.
+
+    The trial ID ends with the hash of the result-affecting spec fields (see 'spec_hash'), so that trials of a spec
+    with another embedder or other chunker parameters are never mistaken for completed ones when resuming.
+
+    Returns:
+    ----------
+    trials (list of dicts): Each trial has the keys 'trial_id', 'spec_hash', 'corpus_id', 'chunker', 'chunk_size',
+                            'chunk_overlap' and 'Nr'.
+    """
+
+    trials = []
+    trial_spec_hash = spec_hash(spec)
+
+    param_combinations = itertools.product(spec['corpora'], spec['chunk_size_values'], spec['overlap_percentages'], spec['Nr_values'])
+
+    for corpus_id, chunk_size, overlap_percentage, Nr in param_combinations:
+
+        chunk_overlap = int(overlap_percentage*chunk_size/100)
+
+        trials.append({
+            'trial_id': f"{corpus_id}_{spec['chunker']['type']}_cs{chunk_size}_co{chunk_overlap}_nr{Nr}_{trial_spec_hash}",
+            'spec_hash': trial_spec_hash,
+            'corpus_id': corpus_id,
+            'chunker': spec['chunker']['type'],
+            'chunk_size': chunk_size,
+            'chunk_overlap': chunk_overlap,
+            'Nr': Nr,
+        })
+
+    return trials
+
+
+def read_manifest(output_dir):
+    """Reads the records of the completed trials from the manifest in 'output_dir' (empty if there is none)."""
+
+    manifest_path = os.path.join(output_dir, MANIFEST_FILE)
+    if not os.path.exists(manifest_path):
+        return []
+
+    with open(manifest_path, "r", encoding="utf-8") as file:
+        return [json.loads(line) for line in file if line.strip()]
+
+
+def make_embedding_function(embedder_spec, cache_dir=None):
+
+    # Imported lazily: loading sentence_transformers pulls in torch
+    from sentence_transformers import SentenceTransformer
+
+    model = SentenceTransformer(embedder_spec['model_id'], cache_folder=cache_dir)
+
+    return lambda text: model.encode(text)
+
+
+def run_sweep(spec, embedding_function=None, embedding_id=None):
+    """
+    Runs all trials of a sweep headlessly (no plotting) and stores structured results in the output directory.
+
+    For every completed trial, a record with its parameters, metrics summary, chunk deduplication statistics and
+    per-stage timings is appended to 'manifest.jsonl', and the per-query metrics are written to 'trials/<trial_id>.csv'.
+    Trials already recorded in the manifest (with the same result-affecting spec fields) are skipped, so an interrupted
+    sweep can be resumed by running it again. At the end, the records of the trials of this spec are collected into
+    'results.csv'.
+
+    Parameters:
+    ----------
+    spec (dict): The sweep spec (see 'load_sweep_spec').
+    embedding_function (Callable, optional): A function that takes a string and returns its embedding.
+                                             Default is None (a sentence transformer is loaded from 'spec["embedder"]').
+    embedding_id (str, optional): Identifier of 'embedding_function', required when it is given. It replaces
+                                  'spec["embedder"]["model_id"]', so that the trial IDs and the cache of encoded queries
+                                  are keyed on the function actually used. Default is None.
+
+    Returns:
+    ----------
+    results (pandas.DataFrame): One row per trial with its parameters, metrics summary, deduplication statistics and timings.
+    """
+
+    if embedding_function is not None:
+        if embedding_id is None:
+            raise ValueError("An 'embedding_id' identifying the custom embedding function must be given with 'embedding_function'.")
+        spec = {**spec, 'embedder': {**spec['embedder'], 'model_id': embedding_id}}
+
+    output_dir = spec['output_dir']
+    os.makedirs(os.path.join(output_dir, 'trials'), exist_ok=True)
+
+    for directory in (spec['cache_dir'], spec['memmap_dir']):
+        if directory is not None:
+            os.makedirs(directory, exist_ok=True)
+
+    all_trials = trial_manifest(spec)
+    completed = {record['trial_id'] for record in read_manifest(output_dir)}
+    trials = [trial for trial in all_trials if trial['trial_id'] not in completed]
+
+    print(f"{len(all_trials) - len(trials)} trials already completed, {len(trials)} to run.")
+
+    if trials and embedding_function is None:
+        start = time.perf_counter()
+        embedding_function = make_embedding_function(spec['embedder'], spec['cache_dir'])
+        print(f"Loaded embedder '{spec['embedder']['model_id']}' in {time.perf_counter() - start:.2f} s.")
+
+    # Shared by all trials of the sweep, since they all use the same embedder
+    embedding_cache = EmbeddingCache()
+    embedding_config = EmbeddingConfig(spec['embedder']['model_id'], spec['embedder']['query_prefix'], spec['embedder']['document_prefix'])
+
+    # Chunk/excerpt overlaps are computed once per chunking and reused for every Nr
+    overlap_cache = {}
+
+    # Encoded queries are constant across the sweep: encoded once per corpus (or loaded from the cache) and memory-mapped
+    query_embeddings = {}
+
+    memory_budget = int(spec['memory_budget_mb']*2**20) if spec['memory_budget_mb'] is not None else None
+
+    chunker_params = {key: value for key, value in spec['chunker'].items() if key != 'type'}
+
+    for trial_index, trial in enumerate(trials):
+
+        print(f"[{trial_index + 1}/{len(trials)}] {trial['trial_id']}")
+
+        if trial['corpus_id'] not in query_embeddings:
+            _, queries, _ = read_dataset(trial['corpus_id'])
+            query_embeddings[trial['corpus_id']] = load_query_embeddings(trial['corpus_id'], queries, embedding_function,
+                                                                         embedding_config, spec['query_cache_dir'])
+
+        chunker = CHUNKERS[trial['chunker']](chunk_size=trial['chunk_size'], chunk_overlap=trial['chunk_overlap'], **chunker_params)
+
+        trial_stats = {}
+        metrics, metrics_summary = retrieval_evaluation_pipeline(trial['corpus_id'], chunker, embedding_function, trial['Nr'],
+                                                                 show_plots=False, n_workers=spec['n_workers'],
+                                                                 memmap_dir=spec['memmap_dir'], trial_stats=trial_stats,
+                                                                 embedding_cache=embedding_cache, embedding_config=embedding_config,
+                                                                 query_embeddings=query_embeddings[trial['corpus_id']],
+                                                                 memory_budget=memory_budget, overlap_cache=overlap_cache)
+
+        metrics.to_csv(os.path.join(output_dir, 'trials', trial['trial_id'] + '.csv'), index_label='query_index')
+
+        record = {
+            **trial,
+            **{key: metrics_summary[key].item() for key in metrics_summary.columns},
+            'N_chunks': trial_stats['N_chunks'],
+            'embedding': trial_stats['embedding'],
+            'timings': trial_stats['timings'],
+        }
+
+        with open(os.path.join(output_dir, MANIFEST_FILE), "a", encoding="utf-8") as file:
+            file.write(json.dumps(record) + '\n')
+
+    # Records of other specs sharing the output directory are kept in the manifest, but not mixed into the results
+    sweep_trial_ids = {trial['trial_id'] for trial in all_trials}
+    records = [record for record in read_manifest(output_dir) if record['trial_id'] in sweep_trial_ids]
+    results = pd.json_normalize(records, sep='_')
+    results.to_csv(os.path.join(output_dir, 'results.csv'), index=False)
+
+    return results
+
+
+def main(argv=None):
+
+    parser = argparse.ArgumentParser(description="Runs a retrieval evaluation sweep headlessly from a YAML/TOML sweep spec.")
+    parser.add_argument('spec', help="Path to the sweep spec ('.yaml', '.yml' or '.toml').")
+    parser.add_argument('--output-dir', default=None, help="Overrides 'output_dir' from the sweep spec.")
+    parser.add_argument('--n-workers', type=int, default=None, help="Overrides 'n_workers' from the sweep spec.")
+    parser.add_argument('--dry-run', action='store_true', help="Only prints the trial manifest.")
+    parser.add_argument('--report', action='store_true', help="Renders the sweep plots into '<output_dir>/report' after the sweep.")
+    args = parser.parse_args(argv)
+
+    spec = load_sweep_spec(args.spec)
+    if args.output_dir is not None:
+        spec['output_dir'] = args.output_dir
+    if args.n_workers is not None:
+        spec['n_workers'] = args.n_workers
+
+    if args.dry_run:
+        for trial in trial_manifest(spec):
+            print(json.dumps(trial))
+        return 0
+
+    run_sweep(spec)
+
+    if args.report:
+        from report import render_headless_report
+        render_headless_report(spec['output_dir'])
+
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
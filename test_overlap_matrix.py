@@ -0,0 +1,74 @@
+import os
+import numpy as np
+import pytest
+from pipeline_utils import read_dataset, chunking_function
+from evaluation import calculate_metrics
+from overlap_matrix import build_overlap_matrix
+from parallel_utils import parallel_evaluation
+
+
+class CharChunker:
+    """Fixed-size character windows, so that the tests do not depend on a tiktoken encoding being available."""
+
+    def __init__(self, chunk_size, chunk_overlap):
+        self.chunk_size = chunk_size
+        self.chunk_overlap = chunk_overlap
+
+    def split_text(self, text):
+        return [text[i:i + self.chunk_size] for i in range(0, len(text), self.chunk_size - self.chunk_overlap)]
+
+
+@pytest.fixture(scope='module')
+def dataset():
+
+    # 'read_dataset' resolves the dataset relative to the repository root
+    cwd = os.getcwd()
+    os.chdir(os.path.dirname(os.path.abspath(__file__)))
+    try:
+        yield read_dataset('state_of_the_union')
+    finally:
+        os.chdir(cwd)
+
+
+def assert_same_metrics(expected, actual):
+
+    expected_metrics, expected_summary, expected_counts = expected
+    actual_metrics, actual_summary, actual_counts = actual
+
+    # Values only: the per-pair loop yields integer columns when all scores of a column are 0
+    assert list(actual_metrics.columns) == list(expected_metrics.columns)
+    np.testing.assert_allclose(actual_metrics.to_numpy(dtype=float), expected_metrics.to_numpy(dtype=float))
+    np.testing.assert_allclose(actual_summary.to_numpy(dtype=float), expected_summary.to_numpy(dtype=float))
+    assert list(actual_counts) == list(expected_counts)
+
+
+@pytest.mark.parametrize('chunk_size, chunk_overlap', [(400, 120), (50, 0), (1000, 500), (37, 11)])
+@pytest.mark.parametrize('Nr', [1, 5, 20])
+def test_overlap_matrix_matches_per_pair_evaluation(dataset, chunk_size, chunk_overlap, Nr):
+
+    corpora, _, relevant_excerpts = dataset
+    _, chunk_metadata = chunking_function(corpora, CharChunker(chunk_size, chunk_overlap))
+
+    rng = np.random.default_rng(chunk_size*100 + Nr)
+    retrieved_ids = np.stack([rng.choice(len(chunk_metadata), size=Nr, replace=False) for _ in range(len(relevant_excerpts))])
+
+    overlap_matrix = build_overlap_matrix(chunk_metadata, relevant_excerpts)
+
+    assert_same_metrics(calculate_metrics(relevant_excerpts, retrieved_ids, chunk_metadata, verbose=False),
+                        calculate_metrics(relevant_excerpts, retrieved_ids, chunk_metadata, verbose=False, overlap_matrix=overlap_matrix))
+
+
+def test_parallel_evaluation_with_overlap_matrix(dataset):
+
+    corpora, _, relevant_excerpts = dataset
+    _, chunk_metadata = chunking_function(corpora, CharChunker(400, 120))
+
+    rng = np.random.default_rng(0)
+    chunks_emb = rng.normal(size=(len(chunk_metadata), 16))
+    queries_emb = rng.normal(size=(len(relevant_excerpts), 16))
+
+    overlap_matrix = build_overlap_matrix(chunk_metadata, relevant_excerpts)
+
+    assert_same_metrics(parallel_evaluation(queries_emb, chunks_emb, chunk_metadata, relevant_excerpts, 5, n_workers=2),
+                        parallel_evaluation(queries_emb, chunks_emb, chunk_metadata, relevant_excerpts, 5, n_workers=2,
+                                            overlap_matrix=overlap_matrix))
@@ -0,0 +1,98 @@
+import numpy as np
+import pytest
+from pipeline_utils import retrieval_function, streaming_retrieval_function, normalize_embeddings, _tile_sizes
+
+
+@pytest.fixture(scope='module')
+def embeddings():
+
+    rng = np.random.default_rng(0)
+    queries_emb = rng.normal(size=(333, 32))
+    chunks_emb = rng.normal(size=(5000, 32))
+
+    return queries_emb, chunks_emb
+
+
+def assert_same_retrieval(expected, actual):
+
+    expected_ids, expected_scores = expected
+    actual_ids, actual_scores = actual
+
+    np.testing.assert_array_equal(actual_ids, expected_ids)
+    np.testing.assert_allclose(actual_scores, expected_scores)
+
+
+@pytest.mark.parametrize('memory_budget', [10_000, 200_000, 10**9])
+@pytest.mark.parametrize('Nr', [1, 10])
+def test_streaming_matches_dense_retrieval(embeddings, memory_budget, Nr):
+
+    queries_emb, chunks_emb = embeddings
+
+    assert_same_retrieval(retrieval_function(queries_emb, chunks_emb, Nr),
+                          streaming_retrieval_function(queries_emb, chunks_emb, Nr, memory_budget))
+
+
+def test_streaming_last_tile_shorter_than_Nr(embeddings):
+
+    queries_emb, chunks_emb = embeddings
+    Nr, memory_budget = 10, 200_000
+
+    # Three full tiles and a last tile of a single chunk
+    _, chunk_tile = _tile_sizes(len(queries_emb), chunks_emb.shape[1], Nr, memory_budget)
+    chunks_emb = chunks_emb[:3*chunk_tile + 1]
+
+    assert_same_retrieval(retrieval_function(queries_emb, chunks_emb, Nr),
+                          streaming_retrieval_function(queries_emb, chunks_emb, Nr, memory_budget))
+
+
+def test_streaming_fewer_chunks_than_Nr(embeddings):
+
+    queries_emb, chunks_emb = embeddings
+
+    top_ids, _ = streaming_retrieval_function(queries_emb, chunks_emb[:7], 10, 300_000)
+
+    assert top_ids.shape == (len(queries_emb), 7)
+    assert_same_retrieval(retrieval_function(queries_emb, chunks_emb[:7], 10),
+                          streaming_retrieval_function(queries_emb, chunks_emb[:7], 10, 300_000))
+
+
+def test_streaming_npy_shards(embeddings, tmp_path):
+
+    queries_emb, chunks_emb = embeddings
+
+    # The middle shard is smaller than Nr, chunk IDs continue across shards
+    shard_paths = []
+    for shard_index, (start, stop) in enumerate([(0, 1700), (1700, 1703), (1703, 5000)]):
+        shard_path = str(tmp_path / f'shard_{shard_index}.npy')
+        np.save(shard_path, chunks_emb[start:stop])
+        shard_paths.append(shard_path)
+
+    assert_same_retrieval(retrieval_function(queries_emb, chunks_emb, 10),
+                          streaming_retrieval_function(queries_emb, shard_paths, 10, 300_000))
+
+
+def test_streaming_list_inputs(embeddings):
+
+    queries_emb, chunks_emb = embeddings
+    expected = retrieval_function(queries_emb, chunks_emb, 5)
+
+    # A list of per-chunk vectors and a list of 2D shards
+    assert_same_retrieval(expected, streaming_retrieval_function(list(queries_emb), list(chunks_emb), 5, 300_000))
+    assert_same_retrieval(expected, streaming_retrieval_function(queries_emb, [chunks_emb[:2], chunks_emb[2:]], 5, 300_000))
+
+
+def test_streaming_normalized_embeddings(embeddings):
+
+    queries_emb, chunks_emb = embeddings
+
+    assert_same_retrieval(retrieval_function(queries_emb, chunks_emb, 10),
+                          streaming_retrieval_function(normalize_embeddings(queries_emb), normalize_embeddings(chunks_emb), 10,
+                                                       200_000, normalized=True))
+
+
+def test_streaming_budget_too_small(embeddings):
+
+    queries_emb, chunks_emb = embeddings
+
+    with pytest.raises(ValueError):
+        streaming_retrieval_function(queries_emb, chunks_emb, 10, 1000)
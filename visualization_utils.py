@@ -3,7 +3,7 @@ import numpy as np
 from pandas.plotting import table as pd_table
 import datetime
 
-def plot_metrics_boxplots(metrics):
+def plot_metrics_boxplots(metrics, save_path=None):
         
         N = metrics.shape[0]
 
@@ -79,7 +79,7 @@ def plot_metrics_boxplots(metrics):
         fig.legend(legend_handles, legend_labels, loc='center left', bbox_to_anchor=(1, 0.5), borderaxespad=0.)
 
         plt.tight_layout()
-        plt.show()
+        _show_or_save(fig, save_path)
 
 
 def plot_highlights_distribution(highlights_per_query):
@@ -122,7 +122,7 @@ def plot_highlighted_tokens_distribution(tokens_per_highlight):
     plt.show()
 
 
-def plot_results_table(results_str):
+def plot_results_table(results_str, save_path=None):
 
     fig, ax = plt.subplots(figsize=(8, 8))
 
@@ -141,8 +141,85 @@ def plot_results_table(results_str):
     ax.axis('off')
 
 
-    import datetime
-    timestamp = datetime.datetime.now().strftime("%Y%m%d_%H%M%S")
-    plt.savefig(f"results_table_{timestamp}.png", dpi=300, bbox_inches='tight')
-    plt.show()
+    if save_path is None:
+        timestamp = datetime.datetime.now().strftime("%Y%m%d_%H%M%S")
+        plt.savefig(f"results_table_{timestamp}.png", dpi=300, bbox_inches='tight')
+        plt.show()
+    else:
+        _show_or_save(fig, save_path)
+
+
+def plot_metric_heatmap(results, metric, save_path=None):
+    """
+    Plots a heatmap of the mean of a metric over the (chunk_size, overlap percentage) grid.
+
+    Parameters:
+    ----------
+    results (pandas.DataFrame): Sweep results for a single corpus and Nr, with 'chunk_size', 'chunk_overlap' and
+                                '<metric>_mean' columns (see 'run_sweep').
+    metric (str): One of 'precision', 'recall' or 'f1'.
+    save_path (str, optional): If given, the figure is saved to this path instead of being shown. Default is None.
+    """
+
+    overlap_percentage = (100*results['chunk_overlap']/results['chunk_size']).round().astype(int)
+    grid = results.assign(overlap_percentage=overlap_percentage).pivot_table(index='chunk_size', columns='overlap_percentage',
+                                                                             values=f'{metric}_mean', aggfunc='mean')
+
+    fig, ax = plt.subplots(figsize=(6, 5))
+    plt.rcParams['font.family'] = 'Times New Roman'
+
+    image = ax.imshow(grid.values, cmap='Greys', aspect='auto', origin='lower')
+    ax.set_xticks(range(grid.shape[1]), grid.columns)
+    ax.set_yticks(range(grid.shape[0]), grid.index)
+    ax.set_xlabel('overlap [%]', fontsize=12)
+    ax.set_ylabel('chunk size [tokens]', fontsize=12)
+    ax.set_title(f'Mean {metric} score [%]', fontsize=12, fontweight='bold')
+
+    for i in range(grid.shape[0]):
+        for j in range(grid.shape[1]):
+            if not np.isnan(grid.values[i, j]):
+                ax.text(j, i, f'{grid.values[i, j]:.2f}', ha='center', va='center', fontsize=9, color='red')
+
+    fig.colorbar(image, ax=ax)
+
+    plt.tight_layout()
+    _show_or_save(fig, save_path)
+
+
+def plot_Nr_curves(results, metric, save_path=None):
+    """
+    Plots the mean of a metric as a function of the number of retrieved chunks (Nr), one curve per chunking configuration.
+
+    Parameters:
+    ----------
+    results (pandas.DataFrame): Sweep results for a single corpus, with 'chunk_size', 'chunk_overlap', 'Nr' and
+                                '<metric>_mean' columns (see 'run_sweep').
+    metric (str): One of 'precision', 'recall' or 'f1'.
+    save_path (str, optional): If given, the figure is saved to this path instead of being shown. Default is None.
+    """
+
+    fig, ax = plt.subplots(figsize=(8, 4))
+    plt.rcParams['font.family'] = 'Times New Roman'
+
+    for (chunk_size, chunk_overlap), curve in results.groupby(['chunk_size', 'chunk_overlap']):
+        curve = curve.sort_values('Nr')
+        ax.plot(curve['Nr'], curve[f'{metric}_mean'], marker='o', markersize=3, linewidth=1,
+                label=f'size={chunk_size}, overlap={chunk_overlap}')
 
+    ax.set_xlabel('Nr', fontsize=12)
+    ax.set_ylabel(f'{metric} [%]', fontsize=12)
+    ax.set_title(f'Mean {metric} score vs. Nr', fontsize=12, fontweight='bold')
+    ax.grid(axis='y', linestyle='--', alpha=0.7)
+    ax.legend(loc='center left', bbox_to_anchor=(1, 0.5), fontsize=8)
+
+    plt.tight_layout()
+    _show_or_save(fig, save_path)
+
+
+def _show_or_save(fig, save_path):
+
+    if save_path is None:
+        plt.show()
+    else:
+        fig.savefig(save_path, dpi=150, bbox_inches='tight')
+        plt.close(fig)